@@ -1,9 +1,19 @@
 import os
+import atexit
 import re
-import json
-import requests
-from datetime import datetime, timezone
-from urllib.parse import urlparse
+import signal
+import time
+import asyncio
+import functools
+import html
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+import aiohttp
+import orjson
+from cachetools import TTLCache
+from datetime import datetime
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 from typing import Optional
 
 from fastapi import FastAPI, Request, Response
@@ -32,18 +42,60 @@ if not BOT_TOKEN or not SHEET_ID or not GOOGLE_SHEETS_JSON:
 
 ALLOWED_CHAT_ID = os.environ.get("ALLOWED_CHAT_ID")  # Opcional
 
-# Inicialización de credenciales y clientes de Google Sheets
-sa_info = json.loads(GOOGLE_SHEETS_JSON)
+# Logs encolados: los handlers solo encolan y un hilo aparte escribe en stderr
+LOG_QUEUE: queue.SimpleQueue = queue.SimpleQueue()
+logger = logging.getLogger("psybrobot")
+logger.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+logger.addHandler(QueueHandler(LOG_QUEUE))
+logger.propagate = False
+LOG_HANDLER = logging.StreamHandler()
+LOG_HANDLER.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+LOG_LISTENER = QueueListener(LOG_QUEUE, LOG_HANDLER)
+# Se arranca al importar (no en lifespan) para que ningún camino deje logs encolados sin escribir
+LOG_LISTENER.start()
+atexit.register(LOG_LISTENER.stop)  # Vacía los logs pendientes al salir
+
+# Credenciales de Google Sheets (el cliente y la planilla se abren al iniciar el bot, no al importar)
+try:
+    sa_info = orjson.loads(GOOGLE_SHEETS_JSON)
+except orjson.JSONDecodeError as e:
+    raise RuntimeError(f"GOOGLE_SHEETS_JSON no es un JSON válido de service account: {e}") from None
 SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive"
 ]
-creds = Credentials.from_service_account_info(sa_info, scopes=SCOPES)
-gclient = gspread.authorize(creds)
-sh = gclient.open_by_key(SHEET_ID)
+
+@functools.cache
+def get_spreadsheet() -> gspread.Spreadsheet:
+    """Autoriza el service account y abre la planilla una sola vez por proceso (bloqueante: se llama al iniciar)."""
+    creds = Credentials.from_service_account_info(sa_info, scopes=SCOPES)
+    return gspread.authorize(creds).open_by_key(SHEET_ID)
 
 MASTER_SHEET = "Master"
-CACHE_URLS_REGISTERED = set()  # Cache en memoria para evitar duplicados
+URL_INDEX: dict[str, set[str]] = {}  # Índice en memoria de URLs registradas por hoja
+PENDING_URLS: dict[str, set[str]] = {}  # URLs encoladas que aún no se escribieron en Sheets
+WS_CACHE: dict[str, gspread.Worksheet] = {}  # Handles de hojas para evitar worksheet() por escritura
+SHEETS_SEM = asyncio.Semaphore(5)  # Máximo de llamadas simultáneas a Google Sheets
+SHEETS_RETRIES = 3  # Reintentos ante errores transitorios de la API de Sheets
+SHEETS_RETRY_STATUS = {429, 500, 502, 503}
+# appendCells no es idempotente: tras un 5xx la fila pudo quedar escrita, así que solo se reintenta el 429 (rechazo)
+SHEETS_APPEND_RETRY_STATUS = {429}
+ROW_QUEUE: asyncio.Queue = asyncio.Queue()  # Filas (hoja, fila, intentos) pendientes de escribir
+ROW_BATCH_SIZE = 50  # Máximo de filas por escritura
+ROW_FLUSH_DELAY = 0.5  # Segundos que se espera para juntar filas antes de escribir
+ROW_RETRIES = 5  # Veces que se reencola una fila que no se pudo escribir
+ROW_RETRY_DELAY = 5  # Segundos de espera base (exponencial) tras un lote fallido
+HEADERS_OK: set[str] = set()  # Hojas con encabezados ya validados
+
+SONGLINK_API_URL = "https://api.song.link/v1-alpha.1/links"
+SONG_SESSION: Optional[aiohttp.ClientSession] = None  # Sesión HTTP compartida (se crea al iniciar el bot)
+SONGLINK_CACHE: TTLCache = TTLCache(maxsize=4096, ttl=3600)  # URL -> (momento de la consulta, metadatos de song.link)
+SONGLINK_CACHE_FILE = os.environ.get("SONGLINK_CACHE_FILE")  # Opcional: conserva la cache entre reinicios
+SONGLINK_RETRIES = 2  # Reintentos ante errores transitorios de song.link
+SONGLINK_RETRY_STATUS = {502, 503, 504}
+# Orden en que se toman los metadatos: los catálogos con datos más limpios primero
+# (el título de un video de YouTube suele traer "(Official Video)" y el canal como artista)
+PLATFORM_PRIORITY = ("spotify", "appleMusic", "youtube", "soundcloud", "bandcamp")
 
 HEADERS_MASTER = [
     "Timestamp", "SharedBy", "SourceChat", "MessageLink",
@@ -54,9 +106,14 @@ HEADERS_MASTER = [
 # Expresiones regulares y plataformas soportadas
 # ========================
 
-URL_RE = re.compile(r'(?P<url>(https?://|www\.)[^\s<>\]]+)', re.IGNORECASE)
-TAG_RE = re.compile(r"#(?!ascucha\b)\w+")
-ASC_LINK_RE = re.compile(r'#ascucha\s+((https?://|www\.)[^\s<>\]]+)', re.IGNORECASE)
+# Alternativa única para encontrar URLs y hashtags dentro de una palabra del mensaje
+TOKEN_RE = re.compile(
+    r'(?i)(?P<url>(?:https?://|www\.)[^\s<>\]]+)'
+    r'|(?P<tag>#\w+)'
+)
+MAX_TEXT_LEN = 8192  # Tope defensivo del texto a analizar (Telegram limita los mensajes a 4096 caracteres)
+
+TELEGRAM_LINK_PREFIXES = ("https://t.me/", "http://t.me/")  # Links que se conservan en las notas
 
 PLATFORM_HOSTS = {
     "youtube": {"youtu.be", "youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com"},
@@ -65,6 +122,19 @@ PLATFORM_HOSTS = {
     "appleMusic": {"apple.com", "music.apple.com"},
     "bandcamp": {"bandcamp.com"}
 }
+# Dominios donde cada artista tiene su propio subdominio (artista.bandcamp.com)
+PLATFORM_SUBDOMAINS = {"bandcamp.com": "bandcamp"}
+# Parámetros de seguimiento que no identifican el contenido y se quitan al normalizar URLs
+TRACKING_PARAMS = {"si", "fbclid", "igshid", "feature", "t"}  # "t" es el segundo de inicio, no otro contenido
+# Índice inverso host -> plataforma para detectar la plataforma con una sola búsqueda
+HOST_TO_PLATFORM = {host: platform for platform, hosts in PLATFORM_HOSTS.items() for host in hosts}
+# Filtro previo barato: descarta sin urlparse los links cuyo host no puede ser de una plataforma soportada
+SUPPORTED_PREFIX_RE = re.compile(
+    r'(?i)(?:https?://)?(?:www\.)?(?:'
+    + "|".join(re.escape(h) for h in sorted(HOST_TO_PLATFORM, key=len, reverse=True))
+    + "|" + "|".join(r'[a-z0-9-]+\.' + re.escape(d) for d in PLATFORM_SUBDOMAINS)
+    + r')(?:[/?#]|$)'
+)
 
 # ========================
 # Utilidades generales
@@ -93,152 +163,475 @@ def get_source_chat(update: Update) -> str:
         return username
     return ""
 
+@functools.lru_cache(maxsize=8192)
+def canonical(url: str) -> tuple[str, str]:
+    """Normaliza una URL una sola vez: devuelve (host, URL canónica sin parámetros de seguimiento).
+
+    Comparten forma canónica las variantes de un mismo link (http/https, www., barra final,
+    youtu.be/ID y youtube.com/watch?v=ID), así que se deduplican entre sí.
+    """
+    url = url.strip()
+    try:
+        p = urlparse(url if "://" in url else f"https://{url}")
+        query = [(k, v) for k, v in parse_qsl(p.query, keep_blank_values=True)
+                 if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS]
+        netloc = p.netloc.lower().removeprefix("www.")
+        path = p.path.rstrip("/")
+        if netloc == "m.youtube.com":
+            netloc = "youtube.com"  # Misma ruta en ambos hosts
+        elif netloc == "youtu.be":
+            video_id = path.lstrip("/")
+            if video_id and "/" not in video_id:
+                query = [("v", video_id)] + [(k, v) for k, v in query if k != "v"]
+                netloc, path = "youtube.com", "/watch"
+            # Otra ruta (p. ej. youtu.be/abc/def) no existe en youtube.com: se deja en youtu.be
+        return netloc, urlunparse(("https", netloc, path, p.params, urlencode(query), ""))
+    except ValueError:
+        return "", url
+
+@functools.lru_cache(maxsize=4096)
 def detect_platform(url: str) -> Optional[str]:
     """Detecta la plataforma del link a partir del host de la URL."""
-    try:
-        host = urlparse(url).netloc.lower()
-        for platform, hosts in PLATFORM_HOSTS.items():
-            if host in hosts:
-                return platform
-    except Exception:
-        pass
-    return None
+    if not SUPPORTED_PREFIX_RE.match(url.strip()):
+        return None
+    host = canonical(url)[0]
+    platform = HOST_TO_PLATFORM.get(host)
+    if platform is None:
+        platform = next((p for domain, p in PLATFORM_SUBDOMAINS.items() if host.endswith("." + domain)), None)
+    return platform
 
 def build_message_link(update: Update) -> str:
     """Construye el vínculo al mensaje de Telegram si es un grupo/supergrupo público."""
-    msg = update.effective_message
     chat = update.effective_chat
-    if not chat or chat.type not in ("supergroup", "group", "private"):
+    if not chat or not chat.username:  # Sin username (grupo privado) no hay link público
         return ""
-    if chat.username and msg is not None:
+    msg = update.effective_message
+    if msg is not None and chat.type in ("supergroup", "group", "private"):
         return f"https://t.me/{chat.username}/{msg.message_id}"
     return ""
 
-def extract_notes(text: str, meta: str = "") -> str:
-    """Extrae notas del texto excluyendo hashtags, URLs y palabras clave, conservando links telegram."""
-    tags = set(TAG_RE.findall(text))
-    urls = set(m.group("url") for m in URL_RE.finditer(text))
-    meta_words = set(meta.split())
-    fragments = text.split()
-    notes_fragments = []
-    for f in fragments:
-        f_lower = f.lower()
-        if f in tags or f in urls or f in meta_words or f == "/add" or f.startswith("#") or f_lower == "#ascucha":
-            if f.startswith("https://t.me/") or f.startswith("http://t.me/"):
-                notes_fragments.append(f)
-        else:
-            notes_fragments.append(f)
-    return " ".join(notes_fragments)
-
-def ensure_headers_in_sheet(sheet_name: str):
-    """Asegura que una hoja tenga los encabezados correctamente y en el orden esperado."""
+def _may_have_token(word: str) -> bool:
+    """Chequeo barato: solo las palabras con '#', '://' o 'www.' pueden contener un hashtag o una URL."""
+    return "#" in word or "://" in word or ("." in word and "www." in word.lower())
+
+@functools.lru_cache(maxsize=1024)
+def extract_and_parse(text: str) -> tuple[tuple[str, ...], tuple[str, ...], tuple[str, ...], str]:
+    """Recorre el texto una sola vez y devuelve (URLs, links #ascucha, hashtags, notas) en orden de aparición.
+
+    Las palabras comunes van directo a las notas; solo las que pueden contener una URL o un hashtag pasan
+    por TOKEN_RE. De lo coincidente solo se conservan en las notas los links de Telegram.
+    Se memoiza por texto (mensajes reenviados llegan repetidos), por eso devuelve tuplas inmutables.
+    """
+    if len(text) > MAX_TEXT_LEN:
+        cut = text[:MAX_TEXT_LEN]
+        if not cut[-1].isspace() and not text[MAX_TEXT_LEN].isspace():
+            # La última palabra quedó a medias (podría ser una URL o etiqueta truncada): descartarla
+            parts = cut.rsplit(None, 1)
+            cut = parts[0] if len(parts) > 1 else ""
+        text = cut
+    urls, ascucha_links, tags, notes = [], [], [], []
+    after_ascucha = False  # La palabra anterior terminó en "#ascucha": si esta empieza con URL, es un link #ascucha
+    for word in text.split():
+        if not _may_have_token(word):
+            if word != "/add":
+                notes.append(word)
+            after_ascucha = False
+            continue
+        last_end = 0
+        ends_with_ascucha = False
+        after_tag = False  # Lo pegado tras un hashtag ("#rock," o "#pop!") no va a las notas
+        for m in TOKEN_RE.finditer(word):
+            gap = word[last_end:m.start()]
+            if gap and not after_tag and not gap.startswith("#"):
+                notes.append(gap)
+            last_end = m.end()
+            url = m.group("url")
+            after_tag = not url
+            if url:
+                if after_ascucha and m.start() == 0:
+                    ascucha_links.append(url)
+                urls.append(url)
+                if url.startswith(TELEGRAM_LINK_PREFIXES):
+                    notes.append(url)
+            elif m.group("tag").lower() != "#ascucha":  # "#ascucha" sin link no es etiqueta
+                tags.append(m.group("tag"))
+            else:
+                ends_with_ascucha = m.end() == len(word)
+        gap = word[last_end:]
+        if gap and not after_tag and gap != "/add" and not gap.startswith("#"):
+            notes.append(gap)
+        after_ascucha = ends_with_ascucha
+    return tuple(urls), tuple(ascucha_links), tuple(tags), " ".join(notes)
+
+def api_status(error: Exception) -> Optional[int]:
+    """Código HTTP de un error de la API de Sheets (None si no es un APIError)."""
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+def is_transient(error: Exception) -> bool:
+    """Indica si un error de Sheets puede resolverse reintentando (cuota, 5xx o fallas de red)."""
+    if isinstance(error, gspread.exceptions.APIError):
+        return api_status(error) in SHEETS_RETRY_STATUS
+    return True
+
+def may_have_applied(error: Exception) -> bool:
+    """Indica si una escritura fallida pudo quedar aplicada igual (5xx o falla de red: no hay confirmación)."""
+    status = api_status(error)
+    return status is None or status >= 500
+
+async def _sheets_call(fn, *args, retry_status: set[int] = SHEETS_RETRY_STATUS, **kwargs):
+    """Ejecuta una llamada bloqueante de gspread en un hilo, limitando la concurrencia.
+
+    Reintenta con espera exponencial los errores transitorios de la API (cuota excedida, 5xx);
+    las escrituras no idempotentes pasan retry_status para reintentar solo los rechazos.
+    """
+    for attempt in range(SHEETS_RETRIES + 1):
+        try:
+            async with SHEETS_SEM:
+                return await asyncio.to_thread(fn, *args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if api_status(e) not in retry_status or attempt == SHEETS_RETRIES:
+                raise
+            await asyncio.sleep(2 ** attempt)  # Fuera del semáforo: no bloquea otras llamadas
+
+async def get_worksheet(sheet_name: str) -> gspread.Worksheet:
+    """Devuelve la hoja desde la cache; solo consulta a Sheets si no se conoce (WorksheetNotFound si no existe)."""
+    ws = WS_CACHE.get(sheet_name)
+    if ws is None:
+        ws = await _sheets_call(get_spreadsheet().worksheet, sheet_name)
+        WS_CACHE[sheet_name] = ws
+    return ws
+
+def set_sheet_state(sheet_name: str, col_h: list):
+    """Indexa las URLs ya registradas en una hoja (columna H, sin el encabezado)."""
+    URL_INDEX[sheet_name] = {canonical(str(r[0]))[1] for r in col_h[1:] if r and r[0]}
+
+async def load_sheet_state(ws: gspread.Worksheet):
+    """Carga bajo demanda las URLs de una hoja que no existía al iniciar (creada a mano mientras el bot corre)."""
+    ranges = [utils.absolute_range_name(ws.title, "H:H")]
+    value_ranges = (await _sheets_call(get_spreadsheet().values_batch_get, ranges)).get("valueRanges", [{}])
+    set_sheet_state(ws.title, value_ranges[0].get("values", []))
+
+def reset_sheet_state(sheet_name: str):
+    """Marca una hoja como recién creada: todavía sin URLs."""
+    URL_INDEX[sheet_name] = set()
+
+async def ensure_headers_in_sheet(sheet_name: str) -> bool:
+    """Asegura que una hoja exista con los encabezados esperados, sin borrar nunca sus datos.
+
+    Devuelve True si falta escribir la fila de encabezados (hoja nueva o con la fila 1 vacía),
+    para que quien llama la incluya en su misma escritura por lotes; la hoja recién se marca
+    en HEADERS_OK cuando esa escritura se confirma.
+    """
     try:
-        ws = sh.worksheet(sheet_name)
+        ws = await get_worksheet(sheet_name)
     except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=sheet_name, rows=100, cols=len(HEADERS_MASTER))
-        ws.append_row(HEADERS_MASTER, value_input_option=utils.ValueInputOption.raw)
+        ws = await _sheets_call(get_spreadsheet().add_worksheet, title=sheet_name, rows=100, cols=len(HEADERS_MASTER))
+        WS_CACHE[sheet_name] = ws
+        reset_sheet_state(sheet_name)
+        return True
+    header = [h.strip() for h in await _sheets_call(ws.row_values, 1)]
+    if sheet_name not in URL_INDEX:
+        await load_sheet_state(ws)
+    if not header:
+        if ws.col_count < len(HEADERS_MASTER):
+            await _sheets_call(ws.add_cols, len(HEADERS_MASTER) - ws.col_count)
+        return True
+    if header != HEADERS_MASTER and header == HEADERS_MASTER[:len(header)]:
+        await complete_headers([ws])
+    elif header != HEADERS_MASTER:
+        warn_header_drift(sheet_name)
+    HEADERS_OK.add(sheet_name)
+    return False
+
+def warn_header_drift(sheet_name: str):
+    """Avisa que una hoja tiene encabezados distintos; se sigue escribiendo por posición sin limpiarla."""
+    logger.warning("⚠️ Los encabezados de '%s' no coinciden con los esperados; se escribe igual sin limpiarla",
+                   sheet_name)
+
+async def load_sheets_state():
+    """Carga en una sola llamada (batchGet) los encabezados y las URLs registradas de cada hoja."""
+    worksheets = await _sheets_call(get_spreadsheet().worksheets)
+    titles = [ws.title for ws in worksheets]
+    if not titles:
         return
-    first_row = ws.row_values(1)
-    if [h.strip() for h in first_row] != HEADERS_MASTER:
-        ws.clear()
-        ws.append_row(HEADERS_MASTER, value_input_option=utils.ValueInputOption.raw)
-
-def ensure_columns(ws, required_cols):
-    """Agrega columnas requeridas si faltan y actualiza encabezados."""
-    headers = ws.row_values(1)
-    added = False
-    for col in required_cols:
-        if col not in headers:
-            headers.append(col)
-            added = True
-    if added:
-        ws.update(range_name="1:1", values=[headers])
-    return headers
+    ranges = []
+    for title in titles:
+        ranges += [utils.absolute_range_name(title, r) for r in ("1:1", "H:H")]
+    value_ranges = (await _sheets_call(get_spreadsheet().values_batch_get, ranges)).get("valueRanges", [])
+    WS_CACHE.clear()
+    WS_CACHE.update({ws.title: ws for ws in worksheets})
+    URL_INDEX.clear()
+    HEADERS_OK.clear()
+    outdated = []
+    for i, title in enumerate(titles):
+        header, col_h = (vr.get("values", []) for vr in value_ranges[2 * i:2 * i + 2])
+        header = [h.strip() for h in header[0]] if header else []
+        if header == HEADERS_MASTER:
+            HEADERS_OK.add(title)
+        elif header and header == HEADERS_MASTER[:len(header)]:
+            outdated.append(WS_CACHE[title])  # Formato anterior: faltan columnas al final (p. ej. Álbum/Año)
+        elif header:
+            warn_header_drift(title)
+            HEADERS_OK.add(title)
+        set_sheet_state(title, col_h)
+    if outdated:
+        await complete_headers(outdated)
+
+async def complete_headers(worksheets: list):
+    """Completa en un solo values.batchUpdate los encabezados de hojas con columnas faltantes."""
+    for ws in worksheets:
+        if ws.col_count < len(HEADERS_MASTER):
+            await _sheets_call(ws.add_cols, len(HEADERS_MASTER) - ws.col_count)
+    data = [{"range": utils.absolute_range_name(ws.title, "A1"), "values": [HEADERS_MASTER]} for ws in worksheets]
+    await _sheets_call(get_spreadsheet().values_batch_update,
+                       {"valueInputOption": utils.ValueInputOption.raw, "data": data})
+    HEADERS_OK.update(ws.title for ws in worksheets)
 
 def row_exists_by_url_in_sheet(url: str, sheet_name: str) -> bool:
-    """Verifica si una URL ya existe en la hoja dada (para evitar duplicados)."""
-    global CACHE_URLS_REGISTERED
-    if sheet_name == MASTER_SHEET and url in CACHE_URLS_REGISTERED:
-        return True
-    try:
-        ws = sh.worksheet(sheet_name)
-    except gspread.WorksheetNotFound:
-        return False
-    urls = ws.col_values(8)
-    url_set = {str(u).strip() for u in urls if u}
-    if sheet_name == MASTER_SHEET:
-        CACHE_URLS_REGISTERED = url_set  # Actualiza cache
-    return str(url).strip() in url_set
-
-def get_songlink_metadata(url: str) -> dict:
+    """Verifica si una URL ya existe (o está encolada) en la hoja dada (para evitar duplicados)."""
+    key = canonical(str(url))[1]
+    return key in URL_INDEX.get(sheet_name, set()) or key in PENDING_URLS.get(sheet_name, set())
+
+async def get_songlink_metadata(url: str) -> dict:
     """Obtiene metadatos musicales de song.link priorizando plataformas más populares."""
-    api_url = "https://api.song.link/v1-alpha.1/links"
-    params = {"url": url}
+    key = canonical(url)[1]
+    cached = SONGLINK_CACHE.get(key)
+    # Las entradas recuperadas del disco conservan su antigüedad real, no la TTL que les dio TTLCache al cargarlas
+    if cached and time.time() - cached[0] < SONGLINK_CACHE.ttl:
+        return cached[1]
+    if SONG_SESSION is None:
+        return {}
+    for attempt in range(SONGLINK_RETRIES + 1):
+        try:
+            async with SONG_SESSION.get(SONGLINK_API_URL, params={"url": key}) as resp:
+                retry = resp.status in SONGLINK_RETRY_STATUS and attempt < SONGLINK_RETRIES
+                if not retry:
+                    resp.raise_for_status()
+                    data = orjson.loads(await resp.read())
+        except Exception:
+            logger.debug("Fallo consultando song.link para %s", key, exc_info=True)
+            return {}
+        if not retry:
+            break
+        await asyncio.sleep(0.3 * 2 ** attempt)  # Con la conexión ya devuelta al pool
+    entities_by_platform = data.get("entitiesByUniqueId", {})
+    links_by_platform = data.get("linksByPlatform", {})
+    entity = None
+    for platform in PLATFORM_PRIORITY:
+        info = links_by_platform.get(platform)
+        if info and "entityUniqueId" in info:
+            entity = entities_by_platform.get(info["entityUniqueId"], {})
+            break
+    else:
+        # Fallback genérico: la entidad del link compartido
+        entity = entities_by_platform.get(data.get("pageEntityUniqueId"))
+    metadata = {
+        "artist": entity.get("artistName", ""),
+        "title": entity.get("title", ""),
+        "album": entity.get("albumName", ""),
+        "year": str(entity.get("year", ""))
+    } if entity is not None else {}
+    SONGLINK_CACHE[key] = (time.time(), metadata)
+    return metadata
+
+def load_songlink_cache():
+    """Recupera las entradas de la cache de song.link guardadas al apagar que todavía no vencieron."""
+    if not SONGLINK_CACHE_FILE:
+        return
     try:
-        resp = requests.get(api_url, params=params, timeout=5)
-        resp.raise_for_status()
-        data = resp.json()
-        entities_by_platform = data.get("entitiesByUniqueId", {})
-        links_by_platform = data.get("linksByPlatform", {})
-        for platform in ["spotify", "appleMusic", "youtube", "soundcloud", "bandcamp"]:
-            info = links_by_platform.get(platform)
-            if info and "entityUniqueId" in info:
-                entity = entities_by_platform.get(info["entityUniqueId"], {})
-                return {
-                    "artist": entity.get("artistName", ""),
-                    "title": entity.get("title", ""),
-                    "album": entity.get("albumName", ""),
-                    "year": str(entity.get("year", ""))
-                }
-        # Fallback genérico
-        main_id = data.get("pageEntityUniqueId")
-        if main_id and main_id in entities_by_platform:
-            entity = entities_by_platform.get(main_id, {})
-            return {
-                "artist": entity.get("artistName", ""),
-                "title": entity.get("title", ""),
-                "album": entity.get("albumName", ""),
-                "year": str(entity.get("year", ""))
-            }
-    except Exception:
-        pass
-    return {}
+        with open(SONGLINK_CACHE_FILE, "rb") as f:
+            snapshot = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return
+    now = time.time()
+    for key, entry in snapshot.get("entries", {}).items():
+        # Se descartan las vencidas y las del formato anterior (sin momento de la consulta)
+        if isinstance(entry, list) and len(entry) == 2 and now - entry[0] < SONGLINK_CACHE.ttl:
+            SONGLINK_CACHE[key] = tuple(entry)
+
+def save_songlink_cache():
+    """Guarda la cache de song.link en disco (escritura atómica) para no perder aciertos al reiniciar."""
+    if not SONGLINK_CACHE_FILE:
+        return
+    tmp_path = SONGLINK_CACHE_FILE + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps({"saved_at": time.time(), "entries": dict(SONGLINK_CACHE.items())}))
+        os.replace(tmp_path, SONGLINK_CACHE_FILE)
+    except OSError as e:
+        logger.error("❌ Error guardando la cache de song.link: %s", e)
 
 # ========================
 # Operaciones de filas en las hojas de Google Sheets
 # ========================
 
-async def append_row_to_sheet(sheet_name: str, row: list):
-    """Agrega una fila a una hoja, asegurando encabezados y columnas requeridas."""
-    ensure_headers_in_sheet(sheet_name)
-    ws = sh.worksheet(sheet_name)
-    ensure_columns(ws, ["Álbum", "Año"])
-    ws.append_row(row, value_input_option=utils.ValueInputOption.raw)
+@functools.lru_cache(maxsize=1024)
+def tag_to_sheet(tag: str) -> str:
+    """Nombre de hoja para una etiqueta: #rock, #Rock y #ROCK van todas a "Rock" ("" si no hay nombre)."""
+    return (tag[1:] if tag.startswith("#") else tag).capitalize()
+
+async def add_worksheets(sheet_names: list[str]) -> list[str]:
+    """Crea con un único spreadsheets.batchUpdate (addSheet) las hojas que no existían al iniciar.
+
+    Devuelve las hojas creadas (todavía sin encabezados); si alguna ya existía (creada a mano),
+    no se crea ninguna y ensure_headers_in_sheet las resuelve una por una.
+    """
+    if not sheet_names:
+        return []
+    body = {"requests": [
+        {"addSheet": {"properties": {"title": sheet_name,
+                                     "gridProperties": {"rowCount": 100, "columnCount": len(HEADERS_MASTER)}}}}
+        for sheet_name in sheet_names
+    ]}
+    sh = get_spreadsheet()
+    try:
+        replies = (await _sheets_call(sh.batch_update, body)).get("replies", [])
+    except gspread.exceptions.APIError:
+        return []
+    created = []
+    for reply in replies:
+        ws = gspread.Worksheet(sh, reply["addSheet"]["properties"], sh.id, sh.client)
+        WS_CACHE[ws.title] = ws
+        reset_sheet_state(ws.title)
+        created.append(ws.title)
+    return created
+
+def sheet_row(values: list) -> dict:
+    """Fila en el formato de celdas de la API; stringValue equivale a RAW (no interpreta fórmulas)."""
+    return {"values": [{"userEnteredValue": {"stringValue": str(v)}} for v in values]}
+
+async def write_rows(batch: list[tuple[str, list]]) -> dict[str, Exception]:
+    """Agrega un lote de filas (de una o varias hojas) con un único spreadsheets.batchUpdate.
+
+    Usa appendCells: Sheets elige la fila (después de la última con datos), así que no se pisan
+    filas agregadas a mano y la cuadrícula crece sola. Devuelve el error de cada hoja que no se
+    pudo escribir; las demás hojas del lote se escriben igual.
+    """
+    failed: dict[str, Exception] = {}
+    # Las hojas nuevas o sin fila de encabezados los reciben en la misma escritura que las filas
+    sheet_names = list(dict.fromkeys(sheet_name for sheet_name, _ in batch))
+    header_sheets = await add_worksheets([sheet_name for sheet_name in sheet_names
+                                          if sheet_name not in WS_CACHE and sheet_name not in HEADERS_OK])
+    for sheet_name in sheet_names:
+        if sheet_name in HEADERS_OK or sheet_name in header_sheets:
+            continue
+        try:
+            if await ensure_headers_in_sheet(sheet_name):
+                header_sheets.append(sheet_name)
+        except Exception as e:
+            failed[sheet_name] = e  # Solo se saltean las filas de esta hoja
+    requests_by_sheet: dict[str, list] = {}
+    for sheet_name in header_sheets:
+        requests_by_sheet[sheet_name] = [{"updateCells": {
+            "start": {"sheetId": WS_CACHE[sheet_name].id, "rowIndex": 0, "columnIndex": 0},
+            "rows": [sheet_row(HEADERS_MASTER)], "fields": "userEnteredValue"}}]
+    # Una hoja cargada recién ahora puede tener ya alguna de las URLs encoladas
+    rows_by_sheet: dict[str, list] = {}
+    for sheet_name, row in batch:
+        if sheet_name not in failed and canonical(str(row[7]))[1] not in URL_INDEX.get(sheet_name, set()):
+            rows_by_sheet.setdefault(sheet_name, []).append(sheet_row(row))
+    for sheet_name, rows in rows_by_sheet.items():
+        requests_by_sheet.setdefault(sheet_name, []).append(
+            {"appendCells": {"sheetId": WS_CACHE[sheet_name].id, "rows": rows, "fields": "userEnteredValue"}})
+    if not requests_by_sheet:
+        return failed
+    sh = get_spreadsheet()
+    try:
+        await _sheets_call(sh.batch_update, {"requests": [r for reqs in requests_by_sheet.values() for r in reqs]},
+                           retry_status=SHEETS_APPEND_RETRY_STATUS)
+    except Exception as e:
+        if len(requests_by_sheet) == 1 or is_transient(e):
+            failed.update(dict.fromkeys(requests_by_sheet, e))
+        else:
+            # Un error permanente de una hoja rechaza el batchUpdate entero: reintentar hoja por hoja
+            for sheet_name, reqs in requests_by_sheet.items():
+                try:
+                    await _sheets_call(sh.batch_update, {"requests": reqs}, retry_status=SHEETS_APPEND_RETRY_STATUS)
+                except Exception as sheet_error:
+                    failed[sheet_name] = sheet_error
+    for sheet_name, error in failed.items():
+        if sheet_name in rows_by_sheet and may_have_applied(error):
+            # Las filas pudieron quedar escritas: releer la columna H para que el reintento no las duplique
+            try:
+                await load_sheet_state(WS_CACHE[sheet_name])
+            except Exception:
+                URL_INDEX.pop(sheet_name, None)  # ensure_headers_in_sheet la vuelve a cargar antes del reintento
+        # Volver a resolver la hoja en el próximo intento (p. ej. si la borraron a mano)
+        WS_CACHE.pop(sheet_name, None)
+        HEADERS_OK.discard(sheet_name)
+    # Solo ahora tienen fila de encabezados; si la escritura falla, se reintentan en el próximo lote
+    HEADERS_OK.update(sheet_name for sheet_name in header_sheets if sheet_name not in failed)
+    return failed
+
+async def sheets_writer():
+    """Tarea de fondo: junta filas encoladas (hasta ROW_BATCH_SIZE o ROW_FLUSH_DELAY) y las escribe juntas.
+
+    Las filas de hojas que fallaron con un error transitorio se reencolan con espera exponencial,
+    hasta ROW_RETRIES veces; con un error permanente se descartan.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await ROW_QUEUE.get()]
+        deadline = loop.time() + ROW_FLUSH_DELAY
+        while len(batch) < ROW_BATCH_SIZE:
+            try:
+                batch.append(await asyncio.wait_for(ROW_QUEUE.get(), deadline - loop.time()))
+            except asyncio.TimeoutError:
+                break
+        try:
+            failed = await write_rows([(sheet_name, row) for sheet_name, row, _ in batch])
+        except Exception as e:
+            failed = {sheet_name: e for sheet_name, _, _ in batch}
+        retry = []
+        for sheet_name, row, attempts in batch:
+            key = canonical(str(row[7]))[1]  # Columna H (URL)
+            error = failed.get(sheet_name)
+            if error is None:
+                URL_INDEX.setdefault(sheet_name, set()).add(key)
+            elif attempts < ROW_RETRIES and is_transient(error):
+                retry.append((sheet_name, row, attempts + 1))
+                continue  # La URL sigue reservada mientras espera el reintento
+            PENDING_URLS.get(sheet_name, set()).discard(key)
+        for sheet_name, error in failed.items():
+            rows = sum(1 for s, _, _ in batch if s == sheet_name)
+            queued = sum(1 for s, _, _ in retry if s == sheet_name)
+            if queued:
+                logger.warning("⚠️ Error escribiendo %d filas en '%s', se reintentarán: %s",
+                               rows, sheet_name, error)
+            else:
+                logger.error("❌ Error escribiendo %d filas en '%s', se descartan: %s", rows, sheet_name, error)
+        # Reencolar antes de task_done para que ROW_QUEUE.join() no termine antes de los reintentos
+        for item in retry:
+            ROW_QUEUE.put_nowait(item)
+        for _ in batch:
+            ROW_QUEUE.task_done()
+        if retry:
+            await asyncio.sleep(ROW_RETRY_DELAY * 2 ** (max(attempts for _, _, attempts in retry) - 1))
 
 async def append_row(context: ContextTypes.DEFAULT_TYPE, update: Update, *, shared_by: str, source_chat: str,
-                    artist: str, title: str, url: str, message_link: str, tags: str = "", notes: str = "",
-                    album: str = "", year: str = ""):
+                    platform: str, artist: str, title: str, url: str, message_link: str, tags: str = "",
+                    notes: str = "", album: str = "", year: str = ""):
     """Agrega una fila a Master y a las hojas correspondientes según etiquetas."""
-    platform = detect_platform(url)
-    ts = datetime.now(timezone.utc).astimezone().isoformat(timespec="seconds")
-    row = [ts, shared_by, source_chat, message_link,
-        platform, artist, title, url, tags, notes, album, year]
-    row = [x if x is not None else "" for x in row]
+    ts = datetime.now().astimezone().isoformat(timespec="seconds")
+    key = canonical(url)[1]  # Se guarda la forma canónica: el mismo link se ve igual en todas las filas
+    row = [ts, shared_by or "", source_chat or "", message_link or "",
+        platform or "", artist or "", title or "", key, tags or "", notes or "", album or "", year or ""]
+    targets = []
     if not row_exists_by_url_in_sheet(url, MASTER_SHEET):
-        await append_row_to_sheet(MASTER_SHEET, row)
+        targets.append(MASTER_SHEET)
     tags_list = tags.split() if tags else []
-    # Early return: Si no hay tags extras, registrar en "Undefined"
+    # Si no hay tags extras, registrar en "Undefined"
     if not tags_list:
         if not row_exists_by_url_in_sheet(url, "Undefined"):
-            await append_row_to_sheet("Undefined", row)
-        return
-    for tag in tags_list:
-        if tag and tag != "#ascucha":
-            tag_name = tag.lstrip("#")
-            if tag_name:
-                sheet_name = tag_name[0].upper() + tag_name[1:].lower()
-                if not row_exists_by_url_in_sheet(url, sheet_name):
-                    await append_row_to_sheet(sheet_name, row)
+            targets.append("Undefined")
+    for tag in tags_list:  # extract_and_parse ya excluye "#ascucha"
+        sheet_name = tag_to_sheet(tag)
+        if sheet_name and sheet_name not in targets and not row_exists_by_url_in_sheet(url, sheet_name):
+            targets.append(sheet_name)
+    # Se encola sin esperar a Sheets; la URL queda reservada para que no se duplique mientras tanto
+    for sheet_name in targets:
+        PENDING_URLS.setdefault(sheet_name, set()).add(key)
+        ROW_QUEUE.put_nowait((sheet_name, row, 0))
 
 # ========================
 # Handlers para telegram - comandos/chat
@@ -259,13 +652,13 @@ async def add_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if update.message:
             await update.message.reply_text("Uso: /add URL")
         return
-    all_urls = [m.group("url") for m in URL_RE.finditer(parts[1])]
+    all_urls, _, tags, notes_str = extract_and_parse(text)
     if not all_urls:
         if update.message:
             await update.message.reply_text("No encontré un URL válido. Formato: /add URL")
         return
-    first_url = all_urls[0]
-    rest_urls = all_urls[1:]
+    first_url = canonical(all_urls[0])[1]
+    rest_urls = [u for u in all_urls[1:] if not u.startswith(TELEGRAM_LINK_PREFIXES)]  # Esos ya están en las notas
     platform = detect_platform(first_url)
     if not platform:
         if update.message:
@@ -275,97 +668,149 @@ async def add_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if update.message:
             await update.message.reply_text("Ya estaba registrado ✅ (duplicado por URL).")
         return
-    tags_raw = TAG_RE.findall(text)
-    tags = [t for t in tags_raw if t.lower() != "ascucha"]
-    tags_str = " ".join(f"#{t}" for t in tags) if tags else ""
-    notes_str = extract_notes(text, "")
+    tags_str = " ".join(tags)
     if rest_urls:
         notes_str = (notes_str + " " + " ".join(rest_urls)).strip()
-    metadata = get_songlink_metadata(first_url) or {}
+    # La confirmación sale en paralelo con la consulta a song.link (la fila se encola igual)
+    replies = [update.message.reply_text("Anotado en Master ✅")] if update.message else []
+    metadata, *reply_results = await asyncio.gather(get_songlink_metadata(first_url), *replies,
+                                                    return_exceptions=True)
+    if isinstance(metadata, BaseException) or not metadata:
+        metadata = {}
     shared_by = get_display_name(update.effective_user)
     source_chat = get_source_chat(update)
     message_link = build_message_link(update)
-    await append_row(context, update, shared_by=shared_by, source_chat=source_chat,
+    await append_row(context, update, shared_by=shared_by, source_chat=source_chat, platform=platform,
                     artist=metadata.get("artist", ""), title=metadata.get("title", ""),
                     url=first_url, message_link=message_link,
                     tags=tags_str, notes=notes_str,
                     album=metadata.get("album", ""), year=metadata.get("year", ""))
-    if update.message:
-        await update.message.reply_text("Anotado en Master ✅")
+    for error in reply_results:
+        if isinstance(error, BaseException):
+            raise error
 
 async def catch_links(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler que captura mensajes de texto con links precedidos por #ascucha."""
     if ALLOWED_CHAT_ID and (not update.effective_chat or str(update.effective_chat.id) != str(ALLOWED_CHAT_ID)):
         return
-    text = (update.message.text_html if update.message else "") or ""
-    ascucha_links = [m.group(1) for m in ASC_LINK_RE.finditer(text)]
+    # text_html escapa &, < y > como entidades: deshacerlo para que las URLs queden tal como se escribieron
+    text = html.unescape((update.message.text_html if update.message else "") or "")
+    _, ascucha_links, tags, notes_str = extract_and_parse(text)
     if not ascucha_links:
         return
-    first_url = ascucha_links[0]
-    rest_urls = ascucha_links[1:]
     shared_by = get_display_name(update.effective_user)
     source_chat = get_source_chat(update)
     message_link = build_message_link(update)
-    tags_raw = TAG_RE.findall(text)
-    tags = [t for t in tags_raw if t.lower() != "ascucha"]
-    tags_str = " ".join(f"#{t}" for t in tags) if tags else ""
-    notes_str = extract_notes(text, "")
-    if rest_urls:
-        notes_str = (notes_str + " " + " ".join(rest_urls)).strip()
-    platform = detect_platform(first_url)
-    if not platform:
-        if update.message:
-            await update.message.reply_text(
-                f"No reconozco la plataforma del URL {first_url}."
-            )
-        return
-    if row_exists_by_url_in_sheet(first_url, MASTER_SHEET):
-        if update.message:
-            await update.message.reply_text("Ya estaba registrado ✅ (duplicado por URL).")
-        return
-    metadata = get_songlink_metadata(first_url) or {}
-    await append_row(context, update, shared_by=shared_by, source_chat=source_chat,
-                    artist=metadata.get("artist", ""), title=metadata.get("title", ""),
-                    url=first_url, message_link=message_link,
-                    tags=tags_str, notes=notes_str,
-                    album=metadata.get("album", ""), year=metadata.get("year", ""))
-    if update.message:
-        await update.message.reply_text("Anotado en Master ✅")
+    tags_str = " ".join(tags)
+    links = list(dict.fromkeys(canonical(u)[1] for u in ascucha_links))  # Variantes del mismo link cuentan una vez
+    platforms = {u: detect_platform(u) for u in links}
+    unknown_urls = [u for u in links if not platforms[u]]
+    new_urls = [u for u in links if platforms[u] and not row_exists_by_url_in_sheet(u, MASTER_SHEET)]
+    # Cada link #ascucha es una fila; los metadatos se consultan en paralelo entre sí
+    # y con las respuestas (plataforma desconocida y confirmación)
+    replies = [update.message.reply_text(f"No reconozco la plataforma del URL {u}.")
+               for u in unknown_urls] if update.message else []
+    if new_urls and update.message:
+        replies.append(update.message.reply_text("Anotado en Master ✅"))
+    results = await asyncio.gather(*(get_songlink_metadata(u) for u in new_urls), *replies,
+                                   return_exceptions=True)
+    for url, metadata in zip(new_urls, results[:len(new_urls)]):
+        if isinstance(metadata, BaseException):
+            metadata = {}
+        await append_row(context, update, shared_by=shared_by, source_chat=source_chat, platform=platforms[url],
+                        artist=metadata.get("artist", ""), title=metadata.get("title", ""),
+                        url=url, message_link=message_link,
+                        tags=tags_str, notes=notes_str,
+                        album=metadata.get("album", ""), year=metadata.get("year", ""))
+    for error in results[len(new_urls):]:
+        if isinstance(error, BaseException):
+            raise error
+    if not new_urls and update.message and len(unknown_urls) < len(links):
+        await update.message.reply_text("Ya estaba registrado ✅ (duplicado por URL).")
 # ====================
 # FASTAPI + Telegram Application para webhooks con lifespan
 # ====================
 
 # Inicialización global de la aplicación de Telegram
 telegram_app = None
+writer_task: Optional[asyncio.Task] = None
+UPDATES_SEM = asyncio.Semaphore(100)  # Máximo de updates procesándose en segundo plano
+INIT_LOCK = asyncio.Lock()  # Evita que dos updates simultáneos inicialicen el bot a la vez
 
 async def init_telegram_app():
     """Inicializa la aplicación de Telegram de forma segura."""
-    global telegram_app
-    if telegram_app is None:
-        telegram_app = Application.builder().token(BOT_TOKEN if BOT_TOKEN is not None else "").build()
-        telegram_app.add_handler(CommandHandler("start", start))
-        telegram_app.add_handler(CommandHandler("add", add_cmd))
-        telegram_app.add_handler(MessageHandler(filters.TEXT, catch_links))  # Sin restricción de grupos
-        await telegram_app.initialize()
-        await telegram_app.start()
-        print("✅ Bot inicializado correctamente")
+    global telegram_app, SONG_SESSION, writer_task
+    if SONG_SESSION is None:
+        SONG_SESSION = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=5),
+            connector=aiohttp.TCPConnector(limit=20, limit_per_host=10),  # Conexiones keep-alive reutilizadas
+            headers={"User-Agent": "PsybroBot/1.0", "Accept": "application/json"}
+        )
+    async with INIT_LOCK:
+        if telegram_app is not None:
+            return
+        await _sheets_call(get_spreadsheet)  # Autorización y apertura de la planilla fuera del event loop
+        await load_sheets_state()
+        if writer_task is None:
+            writer_task = asyncio.create_task(sheets_writer())  # Recién con el estado de las hojas cargado
+        # Se arma en una variable local: si algo falla, telegram_app sigue en None y el próximo update reintenta
+        application = Application.builder().token(BOT_TOKEN if BOT_TOKEN is not None else "").build()
+        application.add_handler(CommandHandler("start", start))
+        application.add_handler(CommandHandler("add", add_cmd))
+        application.add_handler(MessageHandler(filters.TEXT, catch_links))  # Sin restricción de grupos
+        await application.initialize()
+        await application.start()
+        telegram_app = application
+        logger.info("✅ Bot inicializado correctamente")
+
+def clear_caches():
+    """Vacía las caches en memoria (metadatos y URLs normalizadas); se invoca con SIGHUP."""
+    SONGLINK_CACHE.clear()
+    for cached in (canonical, detect_platform, extract_and_parse, tag_to_sheet):
+        cached.cache_clear()
+    logger.info("♻️ Caches vaciadas")
+
+async def process_update_in_background(update: Update):
+    """Procesa un update fuera de la respuesta del webhook y libera su cupo al terminar."""
+    try:
+        await telegram_app.process_update(update)
+    except Exception as e:
+        logger.exception("❌ Error procesando update: %s", e)
+    finally:
+        UPDATES_SEM.release()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gestión del ciclo de vida de la aplicación FastAPI."""
     # Startup - Inicialización
+    load_songlink_cache()
     await init_telegram_app()
-    print("🚀 FastAPI iniciado con bot de Telegram")
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, clear_caches)
+    except (AttributeError, NotImplementedError):
+        pass  # Sin SIGHUP (p. ej. Windows)
+    logger.info("🚀 FastAPI iniciado con bot de Telegram")
     
     yield  # Aquí la aplicación está activa
     
     # Shutdown - Limpieza
-    global telegram_app
+    global telegram_app, SONG_SESSION, writer_task
     if telegram_app:
         await telegram_app.stop()
         await telegram_app.shutdown()
-        print("✅ Bot cerrado correctamente")
-    print("🛑 FastAPI cerrado")
+        logger.info("✅ Bot cerrado correctamente")
+    if writer_task:
+        try:
+            await asyncio.wait_for(ROW_QUEUE.join(), timeout=10)  # Escribir las filas pendientes
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Quedaron %d filas sin escribir en Sheets", ROW_QUEUE.qsize())
+        writer_task.cancel()
+        writer_task = None
+    if SONG_SESSION:
+        await SONG_SESSION.close()
+        SONG_SESSION = None
+    save_songlink_cache()
+    logger.info("🛑 FastAPI cerrado")
 
 # Crear la aplicación FastAPI con lifespan
 app = FastAPI(lifespan=lifespan)
@@ -380,15 +825,18 @@ async def webhook(request: Request):
         await init_telegram_app()
     
     try:
-        json_update = await request.json()
+        json_update = orjson.loads(await request.body())
         if telegram_app:
             update = Update.de_json(json_update, telegram_app.bot)
-            await telegram_app.process_update(update)
+            # Responder a Telegram de inmediato y procesar en segundo plano; si ya hay
+            # demasiados updates en curso, esperar un cupo (backpressure hacia Telegram)
+            await UPDATES_SEM.acquire()
+            telegram_app.create_task(process_update_in_background(update), update=update)
             return Response(content="ok", status_code=200)
         else:
             return Response(content="Error: Telegram app is not initialized", status_code=500)
     except Exception as e:
-        print(f"❌ Error webhook: {str(e)}")
+        logger.exception("❌ Error webhook: %s", e)
         return Response(content=f"Error: {str(e)}", status_code=400)
 
 @app.get("/")
@@ -398,5 +846,5 @@ async def root():
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
-    print(f"✅ FastAPI iniciado en http://localhost:{port}")
\ No newline at end of file
+    logger.info("✅ Iniciando FastAPI en http://localhost:%d", port)
+    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file